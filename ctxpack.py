@@ -2,30 +2,396 @@ import json
 import hashlib
 import os
 import shutil
-import tarfile
 import base64
-import requests
-import tempfile
+import contextlib
+import functools
+import mmap
+import threading
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+# requests, tarfile, tempfile, inspect and concurrent.futures are imported where they
+# are used so local-only commands (inspect, exists --local, cache-hit pull) start fast.
+
 class CtxPackError(Exception): pass
 class ManifestNotFoundError(CtxPackError): pass
 class DigestMismatchError(CtxPackError): pass
 class SecurityError(CtxPackError): pass
 
+class PackHandle:
+    # Read-only, zero-copy views over a pulled pack. Cached packs are stored as
+    # plain uncompressed files, so each mapping starts at offset 0 (page-aligned)
+    # and every process mapping the same file shares one page-cache copy.
+    def __init__(self, uri, path):
+        self.uri = uri
+        self.path = Path(path)
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def files(self):
+        return sorted(str(p.relative_to(self.path)) for p in self.path.rglob('*') if p.is_file())
+
+    def _resolve(self, name):
+        root = self.path.resolve()
+        file = (root / name).resolve()
+        if root not in file.parents:
+            raise SecurityError(f"Path escapes pack: {name}")
+        if not file.is_file():
+            raise CtxPackError(f"{name} not found in {self.uri}")
+        return file
+
+    def mmap(self, name):
+        if name not in self._maps:
+            file = self._resolve(name)
+            with open(file, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    raise CtxPackError(f"Cannot map empty file {name}")
+                self._maps[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[name]
+
+    def view(self, name):
+        if self._resolve(name).stat().st_size == 0:
+            return memoryview(b"")
+        return memoryview(self.mmap(name))
+
+    def numpy(self, name, dtype="float32", shape=None, offset=0):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CtxPackError("numpy is required for PackHandle.numpy()")
+        return np.memmap(self._resolve(name), dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    def close(self):
+        for m in self._maps.values():
+            try:
+                m.close()
+            except BufferError:
+                # A memoryview is still exported; the map is released once it goes away.
+                pass
+        self._maps.clear()
+
+# codec -> (OCI layer media type, file suffix)
+_CODECS = {
+    "gzip": ("application/vnd.oci.image.layer.v1.tar+gzip", ".tar.gz"),
+    "none": ("application/vnd.oci.image.layer.v1.tar", ".tar"),
+}
+
+@contextlib.contextmanager
+def _layer_writer(tar_path, codec):
+    import gzip
+    import tarfile
+
+    with open(tar_path, "wb") as raw:
+        if codec == "gzip":
+            # A fixed header time and no embedded file name keep rebuilt layers byte-identical.
+            with gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) as gz, \
+                    tarfile.open(fileobj=gz, mode="w") as tar:
+                yield tar
+        else:
+            with tarfile.open(fileobj=raw, mode="w") as tar:
+                yield tar
+
+def _merge_tree(src, dst):
+    for file in sorted(Path(src).rglob('*')):
+        if file.is_file():
+            target = Path(dst) / file.relative_to(src)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(file, target)
+
+def _flock(f, blocking=True):
+    try:
+        import fcntl
+    except ImportError:  # No advisory locks (Windows): assume one writer per cache_dir.
+        return
+    fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+def _split_destination(dest):
+    registry, _, repo = dest.partition("/")
+    if not registry or not repo:
+        raise CtxPackError(f"Invalid destination {dest!r}; expected REGISTRY/REPO")
+    return registry, repo
+
+def _utcnow():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+class BlobStore:
+    # Built layer blobs, stored once per digest and indexed by (uri, codec, content digest,
+    # shard) so retries and multi-destination pushes reuse the same bytes. Least recently used
+    # blobs are evicted once the store grows past `budget` bytes, except those pinned by a lease.
+    def __init__(self, root, budget):
+        self.root = Path(root)
+        self.index_path = self.root / "index.json"
+        self.lease_dir = self.root / "leases"
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._leases = {}
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # The index is shared by every process using this cache_dir (push-daemon, CLI push).
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / ".lock", "w") as f:
+                _flock(f)
+                yield
+
+    def _load(self):
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _save(self, index):
+        tmp = self.root / f"index.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    @contextlib.contextmanager
+    def lease(self, uri):
+        # Pins a URI's blobs while a push uses them. Markers are files named after the
+        # holder's pid, so other processes sharing the store see the pin too.
+        marker = self.lease_dir / f"{uri.split(':')[-1]}.{id(self)}.{os.getpid()}"
+        with self._locked():
+            if not self._leases.get(uri):
+                self.lease_dir.mkdir(exist_ok=True)
+                marker.touch()
+            self._leases[uri] = self._leases.get(uri, 0) + 1
+        try:
+            yield
+        finally:
+            with self._locked():
+                self._leases[uri] -= 1
+                if not self._leases[uri]:
+                    del self._leases[uri]
+                    marker.unlink(missing_ok=True)
+
+    def _pinned(self):
+        pinned = set()
+        if not self.lease_dir.exists():
+            return pinned
+        for marker in self.lease_dir.iterdir():
+            full_hash, pid = marker.name.split(".")[0], marker.name.split(".")[-1]
+            if os.name == "posix" and pid.isdigit():
+                try:
+                    os.kill(int(pid), 0)
+                except ProcessLookupError:
+                    marker.unlink(missing_ok=True)  # holder died without releasing
+                    continue
+                except PermissionError:
+                    pass  # alive, owned by another user
+            pinned.add(full_hash)
+        return pinned
+
+    def _remove(self, index, key):
+        entry = index.pop(key)
+        if not any(e["path"] == entry["path"] for e in index.values()):
+            Path(entry["path"]).unlink(missing_ok=True)
+
+    def _evict(self, index):
+        pinned = self._pinned()
+        sizes = {e["path"]: e["size"] for e in index.values()}
+        total = sum(sizes.values())
+        for key in sorted(index, key=lambda k: index[k]["used"]):
+            if total <= self.budget:
+                break
+            if index[key]["uri"].split(":")[-1] in pinned:
+                continue
+            path = index[key]["path"]
+            self._remove(index, key)
+            if path not in {e["path"] for e in index.values()}:
+                total -= sizes[path]
+
+    def get_or_build(self, uri, codec, content_digest, build, shard=0):
+        key = f"{uri}|{codec}|{content_digest}|{shard}"
+        with self._locked():
+            entry = self._load().get(key)
+        if entry and Path(entry["path"]).exists():
+            print(f"Reusing built layer {entry['digest'][:19]}")
+        else:
+            # Built outside the lock so shards of one pack compress in parallel.
+            suffix = _CODECS[codec][1]
+            tmp = self.root / f"tmp_{uri.split(':')[-1][:12]}_{shard}_{os.getpid()}_{threading.get_ident()}{suffix}"
+            try:
+                build(tmp)
+                sha = hashlib.sha256()
+                with open(tmp, "rb") as f:
+                    while chunk := f.read(1024 * 1024): sha.update(chunk)
+                path = self.root / f"{sha.hexdigest()}{suffix}"
+                os.replace(tmp, path)
+            finally:
+                tmp.unlink(missing_ok=True)
+            entry = {"uri": uri, "codec": codec, "digest": f"sha256:{sha.hexdigest()}",
+                     "size": path.stat().st_size, "path": str(path)}
+        with self._locked():
+            index = self._load()
+            existing = index.get(key)
+            if existing and existing["path"] != entry["path"] and Path(existing["path"]).exists():
+                # Another worker registered this key while we were building; keep its blob.
+                if not any(e["path"] == entry["path"] for e in index.values()):
+                    Path(entry["path"]).unlink(missing_ok=True)
+                entry = existing
+            entry["used"] = time.time()
+            index[key] = entry
+            self._evict(index)
+            self._save(index)
+        return entry
+
+    def forget(self, uri):
+        if not self.index_path.exists():
+            return
+        with self._locked():
+            index = self._load()
+            for key in [k for k, e in index.items() if e["uri"] == uri]:
+                self._remove(index, key)
+            self._save(index)
+
+class PushQueue:
+    # Durable push queue: an append-only JSONL journal in cache_dir where the last
+    # record per URI wins. Jobs left "running" by a dead worker are picked up again, and
+    # the drainer compacts the journal so it only grows with outstanding work.
+    def __init__(self, ctx, workers=2, retries=3, backoff=2.0):
+        self.ctx = ctx
+        self.journal = ctx.cache_dir / "push_queue.jsonl"
+        self.lock_path = ctx.cache_dir / "push_queue.lock"
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+
+    def _append(self, uri, **fields):
+        record = {"uri": uri, **fields, "ts": _utcnow()}
+        self.ctx.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            while True:
+                f = open(self.journal, "a+b")
+                _flock(f)
+                # Retry if compaction swapped the journal while we waited for the lock.
+                if os.fstat(f.fileno()).st_ino == os.stat(self.journal).st_ino:
+                    break
+                f.close()
+            with f:
+                line = json.dumps(record) + "\n"
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line  # terminate a torn write so this record stays parseable
+                f.write(line.encode())
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _compact(self):
+        # Rewrite the journal to the last record of each unfinished job; finished pushes are dropped.
+        if not self.journal.exists():
+            return
+        with self._lock, open(self.journal, "a") as f:
+            _flock(f)
+            tmp = self.journal.with_suffix(".tmp")
+            with open(tmp, "w") as out:
+                for job in self.jobs().values():
+                    if job["state"] != "done":
+                        out.write(json.dumps(job) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, self.journal)
+
+    def jobs(self):
+        jobs = {}
+        if not self.journal.exists():
+            return jobs
+        with open(self.journal) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                jobs[record["uri"]] = {**jobs.get(record["uri"], {}), **record}
+        return jobs
+
+    def pending(self):
+        return [uri for uri, job in self.jobs().items() if job["state"] in ("pending", "running")]
+
+    def enqueue(self, uri, to=None):
+        self._append(uri, state="pending", attempts=0, error=None, to=to)
+
+    def status(self):
+        counts = {}
+        for job in self.jobs().values():
+            counts[job["state"]] = counts.get(job["state"], 0) + 1
+        return counts
+
+    def _run(self, uri):
+        job = self.jobs().get(uri, {})
+        attempts = job.get("attempts", 0)
+        error = None
+        while attempts < self.retries:
+            attempts += 1
+            self._append(uri, state="running", attempts=attempts)
+            try:
+                if self.ctx.push(uri, to=job.get("to")):
+                    self._append(uri, state="done", attempts=attempts, error=None)
+                    return True
+                error = "registry rejected manifest"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempts < self.retries:
+                time.sleep(self.backoff * 2 ** (attempts - 1))
+        self._append(uri, state="failed", attempts=attempts, error=error)
+        return False
+
+    def drain(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        # Only one worker per cache_dir drains at a time; others return immediately.
+        self.ctx.cache_dir.mkdir(parents=True, exist_ok=True)
+        while True:
+            with open(self.lock_path, "w") as lock:
+                try:
+                    _flock(lock, blocking=False)
+                except BlockingIOError:
+                    return
+                self._compact()
+                while uris := self.pending():
+                    with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                        list(pool.map(self._run, uris))
+            # A job may have been enqueued while we were releasing the lock.
+            if not self.pending():
+                return
+
+    def start(self):
+        thread = threading.Thread(target=self.drain, name="ctxpack-push-queue")
+        thread.start()
+        return thread
+
+    def serve(self, poll=5.0):
+        while True:
+            self.drain()
+            time.sleep(poll)
+
 class CtxPack:
     def __init__(self, cache_dir=".ctx_cache"):
         self.cache_dir = Path(cache_dir).absolute()
-        self.cache_dir.mkdir(exist_ok=True)
         self.registry_url = os.getenv("CTXP_REGISTRY_URL", "ghcr.io")
         self.repo = os.getenv("CTXP_REPO")
         self.token = os.getenv("CTXP_TOKEN")
         self.user = os.getenv("CTXP_USER", "rozetyp")
+        self.blob_budget = int(os.getenv("CTXP_BLOB_BUDGET", 10 * 1024 ** 3))
+        self.shard_size = max(1, int(os.getenv("CTXP_SHARD_SIZE", 2 * 1024 ** 3)))
+        self.workers = max(1, int(os.getenv("CTXP_WORKERS", os.cpu_count() or 4)))
+
+    def _get_auth_headers(self, scope="pull", registry=None, repo=None):
+        import requests
 
-    def _get_auth_headers(self, scope="pull"):
+        registry = registry or self.registry_url
+        repo = repo or self.repo
         auth_str = base64.b64encode(f"{self.user}:{self.token}".encode()).decode()
-        url = f"https://{self.registry_url}/token?service={self.registry_url}&scope=repository:{self.repo}:{scope}"
+        url = f"https://{registry}/token?service={registry}&scope=repository:{repo}:{scope}"
         r = requests.get(url, headers={"Authorization": f"Basic {auth_str}"})
         if r.status_code != 200:
             raise CtxPackError(f"Auth Failed: {r.status_code} {r.text}")
@@ -34,6 +400,12 @@ class CtxPack:
 
     def _hash_dir(self, path):
         sha256 = hashlib.sha256()
+        if not Path(path).exists():
+            raise CtxPackError(f"Input path does not exist: {path}")
+        if Path(path).is_file():
+            with open(path, 'rb') as f:
+                while chunk := f.read(8192): sha256.update(chunk)
+            return sha256.hexdigest()
         for file in sorted(Path(path).rglob('*')):
             if file.is_file():
                 sha256.update(str(file.relative_to(path)).encode())
@@ -59,13 +431,66 @@ class CtxPack:
         contract_hash = hashlib.sha256(json.dumps(c, sort_keys=True).encode()).hexdigest()
         return f"ctx://sha256:{contract_hash}"
 
-    def pull(self, uri):
+    def _fetch_layer(self, layer, headers, dest):
+        import requests
+        import tarfile
+
+        digest = layer["digest"]
+        print(f"Downloading layer {digest[:12]}...")
+
+        blob_url = f"https://{self.registry_url}/v2/{self.repo}/blobs/{digest}"
+        with requests.get(blob_url, headers=headers, stream=True) as br:
+            br.raise_for_status()
+            sha = hashlib.sha256()
+            tar_tmp = self.cache_dir / f"tmp_{digest.replace(':', '_')}.tar"
+            try:
+                with open(tar_tmp, "wb") as f:
+                    for chunk in br.iter_content(chunk_size=1024 * 1024):
+                        if chunk:
+                            f.write(chunk)
+                            sha.update(chunk)
+
+                if f"sha256:{sha.hexdigest()}" != digest:
+                    raise DigestMismatchError(f"Layer corruption detected for {digest}")
+
+                # Safe Extraction
+                dest.mkdir(parents=True)
+                with tarfile.open(tar_tmp, "r:*") as tar:
+                    for member in tar.getmembers():
+                        if member.name.startswith("/") or ".." in member.name:
+                            raise SecurityError(f"Unsafe tar member detected: {member.name}")
+                    tar.extractall(path=dest)
+            finally:
+                if tar_tmp.exists():
+                    os.remove(tar_tmp)
+
+    def _local_path(self, uri):
+        # A pack is only complete once every shard is present; partial pulls leave a marker.
+        full_hash = uri.split(":")[-1]
+        path = self.cache_dir / full_hash
+        if path.exists() and not (self.cache_dir / f"{full_hash}.partial").exists():
+            return path
+        return None
+
+    def pull(self, uri, shards=None):
         contract_hash = uri.split(":")[-1]
         short_id = contract_hash[:12]
         final_path = self.cache_dir / contract_hash
-        
+        partial_path = self.cache_dir / f"{contract_hash}.partial"
+        present = set(json.loads(partial_path.read_text())) if partial_path.exists() else None
+        if shards is not None and not shards:
+            raise CtxPackError("pull(shards=[]) requests nothing; pass None for the whole pack")
+
         if final_path.exists():
-            return final_path
+            if present is None or (shards is not None and set(shards) <= present):
+                return final_path
+        elif present is not None:
+            # The pack dir was deleted; the marker no longer describes anything on disk.
+            partial_path.unlink()
+            present = None
+
+        import requests
+        from concurrent.futures import ThreadPoolExecutor
 
         print(f"--- HARDENED PULL: {uri} ---")
         headers = self._get_auth_headers("pull")
@@ -104,35 +529,30 @@ class CtxPack:
                 r = requests.get(f"https://{self.registry_url}/v2/{self.repo}/manifests/{digest}", headers=headers)
                 manifest = r.json()
 
-            # 2. Download Layers with Integrity Check
-            for layer in manifest.get("layers", []):
-                digest = layer["digest"]
-                print(f"Downloading layer {digest[:12]}...")
-                
-                blob_url = f"https://{self.registry_url}/v2/{self.repo}/blobs/{digest}"
-                with requests.get(blob_url, headers=headers, stream=True) as br:
-                    br.raise_for_status()
-                    sha = hashlib.sha256()
-                    tar_tmp = self.cache_dir / f"tmp_{digest[:12].replace(':', '_')}.tar.gz"
-                    with open(tar_tmp, "wb") as f:
-                        for chunk in br.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                                sha.update(chunk)
-                    
-                    if f"sha256:{sha.hexdigest()}" != digest:
-                        raise DigestMismatchError(f"Layer corruption detected for {digest}")
-
-                    # 3. Safe Extraction
-                    with tarfile.open(tar_tmp, "r:gz") as tar:
-                        for member in tar.getmembers():
-                            if member.name.startswith("/") or ".." in member.name:
-                                raise SecurityError(f"Unsafe tar member detected: {member.name}")
-                        tar.extractall(path=extract_path)
-                    os.remove(tar_tmp)
+            # 2. Select Shards (single-layer packs are shard 0)
+            layers = {int(layer.get("annotations", {}).get("org.ctxpack.shard", i)): layer
+                      for i, layer in enumerate(manifest.get("layers", []))}
+            wanted = set(shards) if shards is not None else set(layers)
+            if wanted - set(layers):
+                raise CtxPackError(f"Pack {short_id} has no shard(s) {sorted(wanted - set(layers))}")
+            todo = sorted(wanted - (present or set()))
+            if not todo and present is not None:
+                # The marker already lists every wanted shard, e.g. after a crash before it
+                # was cleared; there is nothing to fetch.
+                if present >= set(layers):
+                    partial_path.unlink(missing_ok=True)
+                return final_path
+
+            # 3. Download, verify and extract layers in parallel
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(lambda i: self._fetch_layer(layers[i], headers, extract_path / f"shard_{i}"), todo))
+            tree = extract_path / "tree"
+            tree.mkdir()
+            for i in todo:
+                _merge_tree(extract_path / f"shard_{i}", tree)
 
             # 4. Final Validation
-            ctx_manifest_path = extract_path / "manifest.json"
+            ctx_manifest_path = tree / "manifest.json"
             if not ctx_manifest_path.exists():
                 raise CtxPackError("Downloaded pack missing internal manifest.json")
             
@@ -141,85 +561,195 @@ class CtxPack:
                 if inner["uri"] != uri:
                     raise CtxPackError(f"Identity mismatch! Expected {uri}, got {inner['uri']}")
 
-            # Atomic move to final location
-            print(f"Moving {extract_path} to {final_path}...")
-            if final_path.exists(): shutil.rmtree(final_path)
-            shutil.move(str(extract_path), str(final_path))
+            # Move to final location; a partial pack is marked before it becomes visible.
+            present = (present or set()) | set(todo)
+            complete = present >= set(layers)
+            if not complete and not partial_path.exists():
+                partial_path.write_text("[]")
+            if final_path.exists():
+                print(f"Merging {len(todo)} shard(s) into {final_path}...")
+                _merge_tree(tree, final_path)
+            else:
+                print(f"Moving {tree} to {final_path}...")
+                shutil.move(str(tree), str(final_path))
+            if complete:
+                partial_path.unlink(missing_ok=True)
+            else:
+                partial_path.write_text(json.dumps(sorted(present)))
             print(f"✅ Successfully pulled and verified {short_id}")
             return final_path
         finally:
             if extract_path.exists():
                 shutil.rmtree(extract_path)
 
-    def seed(self, result_folder, contract):
+    def exists(self, uri, local=False):
+        if self._local_path(uri):
+            return True
+        if local or not self.repo:
+            return False
+        import requests
+
+        headers = self._get_auth_headers("pull")
+        headers["Accept"] = "application/vnd.oci.image.manifest.v1+json, application/vnd.oci.image.index.v1+json"
+        url = f"https://{self.registry_url}/v2/{self.repo}/manifests/{uri.split(':')[-1][:12]}"
+        return requests.head(url, headers=headers).status_code == 200
+
+    def lookup(self, uri):
+        path = self._local_path(uri)
+        if path:
+            return path
+        if not self.repo:
+            return None
+        try:
+            return self.pull(uri)
+        except ManifestNotFoundError:
+            return None
+
+    def open(self, uri):
+        return PackHandle(uri, self.pull(uri))
+
+    @functools.cached_property
+    def blobs(self):
+        return BlobStore(self.cache_dir / "blobs", self.blob_budget)
+
+    @functools.cached_property
+    def queue(self):
+        return PushQueue(self)
+
+    def _plan_shards(self, path, shards=None):
+        # Greedy largest-first packing of files into N shards of roughly equal size.
+        files = [(f.stat().st_size, str(f.relative_to(path))) for f in sorted(Path(path).rglob('*'))
+                 if f.is_file() and str(f.relative_to(path)) != "manifest.json"]
+        total = sum(size for size, _ in files)
+        n = max(1, min(shards or -(-total // self.shard_size), len(files)))
+        if n == 1:
+            return None
+        bins = [{"size": 0, "files": []} for _ in range(n)]
+        for size, name in sorted(files, reverse=True):
+            b = min(bins, key=lambda b: b["size"])
+            b["size"] += size
+            b["files"].append(name)
+        for b in bins:
+            b["files"].sort()
+        return bins
+
+    def seed(self, result_folder, contract, enqueue=False, shards=None, to=None):
         uri = self.get_uri(contract)
         full_hash = uri.split(":")[-1]
         target_path = self.cache_dir / full_hash
         if target_path.exists(): shutil.rmtree(target_path)
+        (self.cache_dir / f"{full_hash}.partial").unlink(missing_ok=True)
+        self.blobs.forget(uri)
         shutil.copytree(result_folder, target_path)
         manifest = {
             "uri": uri,
             "contract": contract,
-            "provenance": {"host": os.uname().nodename, "user": self.user, "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}
+            "provenance": {"host": os.uname().nodename, "user": self.user, "timestamp": _utcnow()}
         }
+        shard_plan = self._plan_shards(target_path, shards)
+        if shard_plan:
+            manifest["shards"] = shard_plan
         with open(target_path / "manifest.json", "w") as f:
             json.dump(manifest, f, indent=2)
+        if enqueue:
+            self.queue.enqueue(uri, to=to)
         return uri
 
-    def push(self, uri):
+    def _build_blobs(self, uri, codec="gzip"):
+        from concurrent.futures import ThreadPoolExecutor
+
         full_hash = uri.split(":")[-1]
-        short_id = full_hash[:12]
         path = self.cache_dir / full_hash
-        tar_path = self.cache_dir / f"{full_hash}.tar.gz"
-        
-        with tarfile.open(tar_path, "w:gz") as tar:
-            for item in os.listdir(path):
-                tar.add(path / item, arcname=item)
-        
-        blob_data = tar_path.read_bytes()
-        blob_digest = f"sha256:{hashlib.sha256(blob_data).hexdigest()}"
-        blob_size = len(blob_data)
+        manifest_path = path / "manifest.json"
+        if not manifest_path.exists():
+            raise CtxPackError(f"{uri} not in local cache; seed it first.")
+        # manifest.json is rewritten on every seed, so its digest stands in for the tree.
+        content_digest = f"sha256:{hashlib.sha256(manifest_path.read_bytes()).hexdigest()}"
 
-        print(f"--- HARDENED PUSH: {short_id} ---")
-        token_headers = self._get_auth_headers("pull,push")
-        headers = {**token_headers, "Accept": "application/vnd.oci.image.manifest.v1+json"}
+        shards = json.loads(manifest_path.read_text()).get("shards")
+
+        def build_shard(i):
+            def build(tar_path):
+                with _layer_writer(tar_path, codec) as tar:
+                    if shards is None:
+                        for item in sorted(os.listdir(path)):
+                            tar.add(path / item, arcname=item)
+                    else:
+                        # Every shard carries manifest.json so any subset can be validated.
+                        tar.add(manifest_path, arcname="manifest.json")
+                        for name in shards[i]["files"]:
+                            tar.add(path / name, arcname=name)
+            return self.blobs.get_or_build(uri, codec, content_digest, build, shard=i)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(build_shard, range(len(shards) if shards else 1)))
+
+    def _upload_blob(self, blob, headers, registry, repo):
+        import requests
 
-        # 1. Start Blob Upload
-        url = f"https://{self.registry_url}/v2/{self.repo}/blobs/uploads/"
-        r = requests.post(url, headers=headers)
+        # Skipped if the registry already has these bytes
+        r = requests.head(f"https://{registry}/v2/{repo}/blobs/{blob['digest']}", headers=headers)
+        if r.status_code == 200:
+            print(f"Layer {blob['digest'][:19]} already present, skipping upload.")
+            return
+        r = requests.post(f"https://{registry}/v2/{repo}/blobs/uploads/", headers=headers)
         upload_url = r.headers.get("Location")
         if not upload_url.startswith("http"):
-            upload_url = f"https://{self.registry_url}{upload_url}" if upload_url.startswith("/") else f"https://{self.registry_url}/v2/{self.repo}/blobs/uploads/{upload_url}"
-
-        # 2. Upload Blob
+            upload_url = f"https://{registry}{upload_url}" if upload_url.startswith("/") else f"https://{registry}/v2/{repo}/blobs/uploads/{upload_url}"
         separator = "?" if "?" not in upload_url else "&"
-        requests.put(f"{upload_url}{separator}digest={blob_digest}", headers=headers, data=blob_data)
+        with open(blob["path"], "rb") as f:
+            requests.put(f"{upload_url}{separator}digest={blob['digest']}", headers=headers, data=f)
 
-        # 3. Upload Config
+    def _push_layers(self, uri, blobs, registry, repo):
+        import requests
+        from concurrent.futures import ThreadPoolExecutor
+
+        short_id = uri.split(":")[-1][:12]
+        print(f"--- HARDENED PUSH: {short_id} -> {registry}/{repo} ---")
+        token_headers = self._get_auth_headers("pull,push", registry, repo)
+        headers = {**token_headers, "Accept": "application/vnd.oci.image.manifest.v1+json"}
+
+        # 1. Upload Layers in parallel
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(lambda blob: self._upload_blob(blob, headers, registry, repo), blobs))
+
+        # 2. Upload Config
         config_data = b"{}"
         config_digest = f"sha256:{hashlib.sha256(config_data).hexdigest()}"
-        r = requests.post(f"https://{self.registry_url}/v2/{self.repo}/blobs/uploads/", headers=headers)
+        r = requests.post(f"https://{registry}/v2/{repo}/blobs/uploads/", headers=headers)
         cfg_url = r.headers.get("Location")
-        if not cfg_url.startswith("http"): cfg_url = f"https://{self.registry_url}{cfg_url}"
+        if not cfg_url.startswith("http"): cfg_url = f"https://{registry}{cfg_url}"
         cfg_separator = "?" if "?" not in cfg_url else "&"
         requests.put(f"{cfg_url}{cfg_separator}digest={config_digest}", headers=headers, data=config_data)
 
-        # 4. Upload Manifest
+        # 3. Upload Manifest
         manifest = {
             "schemaVersion": 2,
             "mediaType": "application/vnd.oci.image.manifest.v1+json",
             "config": {"mediaType": "application/vnd.oci.image.config.v1+json", "size": len(config_data), "digest": config_digest},
-            "layers": [{"mediaType": "application/vnd.oci.image.layer.v1.tar+gzip", "size": blob_size, "digest": blob_digest}]
+            "layers": [{"mediaType": _CODECS[blob["codec"]][0], "size": blob["size"], "digest": blob["digest"]} for blob in blobs]
         }
+        if len(blobs) > 1:
+            for i, layer in enumerate(manifest["layers"]):
+                layer["annotations"] = {"org.ctxpack.shard": str(i)}
         headers["Content-Type"] = "application/vnd.oci.image.manifest.v1+json"
-        url = f"https://{self.registry_url}/v2/{self.repo}/manifests/{short_id}"
+        url = f"https://{registry}/v2/{repo}/manifests/{short_id}"
         r = requests.put(url, headers=headers, json=manifest)
-        
+
         if r.status_code in [200, 201]:
-            print(f"✅ Successfully pushed {short_id}")
+            print(f"✅ Successfully pushed {short_id} to {registry}/{repo}")
             return True
         return False
 
+    def push(self, uri, to=None, codec="gzip"):
+        # `to` is a list of "registry/repo" destinations; all of them share the built blobs,
+        # which stay pinned in the blob store until every destination is done.
+        destinations = [_split_destination(d) for d in to] if to else [(self.registry_url, self.repo)]
+        with self.blobs.lease(uri):
+            blobs = self._build_blobs(uri, codec)
+            results = [self._push_layers(uri, blobs, registry, repo) for registry, repo in destinations]
+        return all(results)
+
     def inspect(self, uri):
         full_hash = uri.split(":")[-1]
         path = self.cache_dir / full_hash
@@ -230,6 +760,155 @@ class CtxPack:
         with open(manifest_path) as f:
             print(json.dumps(json.load(f), indent=2))
 
+_inflight_lock = threading.Lock()
+_inflight = {}
+
+def _acquire_key(uri):
+    # One refcounted lock per URI so concurrent callers in this process share a single
+    # computation; the entry is dropped once its last holder releases it.
+    with _inflight_lock:
+        slot = _inflight.setdefault(uri, [threading.Lock(), 0])
+        slot[1] += 1
+    slot[0].acquire()
+
+def _release_key(uri):
+    with _inflight_lock:
+        slot = _inflight[uri]
+        slot[0].release()
+        slot[1] -= 1
+        if not slot[1]:
+            del _inflight[uri]
+
+def _const_repr(const):
+    # frozenset iteration order depends on string hash randomisation, so sort it.
+    if isinstance(const, tuple):
+        return "(" + ",".join(_const_repr(c) for c in const) + ")"
+    if isinstance(const, frozenset):
+        return "frozenset(" + ",".join(sorted(_const_repr(c) for c in const)) + ")"
+    return repr(const)
+
+def _hash_code(code, sha):
+    # Bytecode alone omits literals and names, so fold in constants (recursing into
+    # nested functions, lambdas and comprehensions) and referenced names as well.
+    sha.update(code.co_code)
+    sha.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, type(code)):
+            _hash_code(const, sha)
+        else:
+            sha.update(_const_repr(const).encode())
+
+def _jsonable(value, name):
+    # Normalise call args for the contract; anything without a stable JSON form is rejected.
+    if isinstance(value, os.PathLike):
+        return os.fspath(value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v, f"{name}[{i}]") for i, v in enumerate(value)]
+    if isinstance(value, dict) and all(isinstance(k, str) for k in value):
+        return {k: _jsonable(v, f"{name}[{k!r}]") for k, v in value.items()}
+    raise CtxPackError(f"cached() argument {name} of type {type(value).__name__} is not JSON-serializable")
+
+class CacheEntry:
+    def __init__(self, uri, path=None, out_dir=None):
+        self.uri = uri
+        self.path = path
+        self.out_dir = out_dir
+
+    @property
+    def hit(self):
+        return self.out_dir is None
+
+class _Cached:
+    def __init__(self, inputs, params, name, push, ctx):
+        self.inputs = [i if isinstance(i, dict) else {"path": str(i)} for i in inputs]
+        self.params = params or {}
+        self.name = name
+        self.push = push
+        self.ctx = ctx or CtxPack()
+        self._entry = None
+
+    def contract(self, tool, code_hash=None, params=None):
+        transform = {"tool": tool, "params": {**self.params, **(params or {})}}
+        if code_hash:
+            transform["code_hash"] = code_hash
+        return {"inputs": self.inputs, "transforms": [transform]}
+
+    def _begin(self, contract):
+        import tempfile
+
+        uri = self.ctx.get_uri(contract)
+        _acquire_key(uri)
+        try:
+            path = self.ctx.lookup(uri)
+            if path:
+                return CacheEntry(uri, path)
+            return CacheEntry(uri, out_dir=Path(tempfile.mkdtemp(prefix="ctxpack_out_")))
+        except BaseException:
+            _release_key(uri)
+            raise
+
+    def _finish(self, entry, contract, ok):
+        try:
+            if not entry.hit and ok:
+                self.ctx.seed(entry.out_dir, contract, enqueue=self.push)
+                entry.path = self.ctx.cache_dir / entry.uri.split(":")[-1]
+                if self.push:
+                    self.ctx.queue.start()
+        finally:
+            if not entry.hit:
+                shutil.rmtree(entry.out_dir, ignore_errors=True)
+            _release_key(entry.uri)
+
+    def __call__(self, fn):
+        import inspect
+
+        sha = hashlib.sha256()
+        try:
+            sha.update(inspect.getsource(fn).encode())
+        except (OSError, TypeError):
+            # No source (exec, python -c, frozen code): fingerprint the code object instead.
+            _hash_code(fn.__code__, sha)
+            defaults = {"defaults": _jsonable(fn.__defaults__ or (), "defaults"),
+                        "kwdefaults": _jsonable(fn.__kwdefaults__ or {}, "kwdefaults")}
+            sha.update(json.dumps(defaults, sort_keys=True).encode())
+        code_hash = f"sha256:{sha.hexdigest()}"
+        tool = self.name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            params = {"args": [_jsonable(a, f"args[{i}]") for i, a in enumerate(args)],
+                      "kwargs": {k: _jsonable(v, k) for k, v in kwargs.items()}}
+            contract = self.contract(tool, code_hash, params)
+            entry = self._begin(contract)
+            ok = False
+            try:
+                if not entry.hit:
+                    fn(entry.out_dir, *args, **kwargs)
+                ok = True
+            finally:
+                self._finish(entry, contract, ok)
+            return entry.path
+        return wrapper
+
+    def __enter__(self):
+        if not self.name:
+            raise CtxPackError("cached() needs a name when used as a context manager")
+        self._contract = self.contract(self.name)
+        self._entry = self._begin(self._contract)
+        return self._entry
+
+    def __exit__(self, exc_type, exc, tb):
+        entry, self._entry = self._entry, None
+        self._finish(entry, self._contract, exc_type is None)
+
+def cached(inputs=(), params=None, name=None, push=False, ctx=None):
+    # Decorated functions are called as fn(out_dir, *args, **kwargs) on a miss and the
+    # wrapper returns the cached pack directory. As a context manager, build into
+    # entry.out_dir when entry.hit is False; the directory is seeded on a clean exit.
+    return _Cached(inputs, params, name, push, ctx)
+
 def main():
     import argparse
     import sys
@@ -237,38 +916,105 @@ def main():
     parser = argparse.ArgumentParser(description="CtxPack: Bazel for AI Artifacts")
     subparsers = parser.add_subparsers(dest="command")
 
+    def positive_int(value):
+        try:
+            n = int(value)
+        except ValueError:
+            n = 0
+        if n < 1:
+            raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+        return n
+
+    def destination(value):
+        try:
+            _split_destination(value)
+        except CtxPackError as e:
+            raise argparse.ArgumentTypeError(str(e))
+        return value
+
     # Inspect
     inspect_parser = subparsers.add_parser("inspect")
     inspect_parser.add_argument("uri", help="The ctx:// URI to inspect")
 
+    # Exists
+    exists_parser = subparsers.add_parser("exists")
+    exists_parser.add_argument("uri", help="The ctx:// URI to look up")
+    exists_parser.add_argument("--local", action="store_true", help="Only check the local cache; never touch the network")
+
+    # Get URI
+    get_uri_parser = subparsers.add_parser("get-uri")
+    get_uri_parser.add_argument("--contract", required=True, help="Path to the contract.json file")
+
     # Seed
     seed_parser = subparsers.add_parser("seed")
     seed_parser.add_argument("folder", help="The output folder to seal")
     seed_parser.add_argument("--contract", required=True, help="Path to the contract.json file")
+    seed_parser.add_argument("--enqueue", action="store_true", help="Queue the pack for a background push")
+    seed_parser.add_argument("--shards", type=int, help="Split the pack into N layers (default: by CTXP_SHARD_SIZE)")
+    seed_parser.add_argument("--to", nargs="+", type=destination, metavar="REGISTRY/REPO", help="Destinations for the queued push (with --enqueue)")
 
     # Pull
     pull_parser = subparsers.add_parser("pull")
     pull_parser.add_argument("uri", help="The ctx:// URI to pull")
+    pull_parser.add_argument("--shards", type=int, nargs="+", help="Only pull these shard indices")
 
     # Push
     push_parser = subparsers.add_parser("push")
     push_parser.add_argument("uri", help="The ctx:// URI to push")
+    push_parser.add_argument("--to", nargs="+", type=destination, metavar="REGISTRY/REPO", help="Push to these destinations instead of CTXP_REGISTRY_URL/CTXP_REPO")
+    push_parser.add_argument("--codec", choices=sorted(_CODECS), default="gzip", help="Layer compression")
+
+    # Push daemon
+    daemon_parser = subparsers.add_parser("push-daemon")
+    daemon_parser.add_argument("--workers", type=positive_int, default=2, help="Concurrent uploads")
+    daemon_parser.add_argument("--retries", type=positive_int, default=3, help="Attempts per pack before giving up")
+    daemon_parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+
+    # Queue
+    queue_parser = subparsers.add_parser("queue")
+    queue_parser.add_argument("action", choices=["status"])
 
     args = parser.parse_args()
     ctx = CtxPack()
 
     if args.command == "inspect":
         ctx.inspect(args.uri)
+    elif args.command == "exists":
+        found = ctx.exists(args.uri, local=args.local)
+        print("yes" if found else "no")
+        sys.exit(0 if found else 1)
+    elif args.command == "get-uri":
+        with open(args.contract, "r") as f:
+            print(ctx.get_uri(json.load(f)))
     elif args.command == "seed":
+        if args.to and not args.enqueue:
+            seed_parser.error("--to only applies to queued pushes; add --enqueue or use `ctxpack push --to`")
         with open(args.contract, "r") as f:
             contract = json.load(f)
-        uri = ctx.seed(args.folder, contract)
+        uri = ctx.seed(args.folder, contract, enqueue=args.enqueue, shards=args.shards, to=args.to)
         print(f"Seeded: {uri}")
+        if args.enqueue:
+            print("Queued for push. Run `ctxpack push-daemon` to upload.")
     elif args.command == "pull":
-        path = ctx.pull(args.uri)
+        path = ctx.pull(args.uri, shards=args.shards)
         print(f"Artifact available at: {path}")
     elif args.command == "push":
-        ctx.push(args.uri)
+        ctx.push(args.uri, to=args.to, codec=args.codec)
+    elif args.command == "push-daemon":
+        queue = PushQueue(ctx, workers=args.workers, retries=args.retries)
+        if args.once:
+            queue.drain()
+        else:
+            queue.serve()
+    elif args.command == "queue":
+        jobs = ctx.queue.jobs()
+        for uri, job in jobs.items():
+            line = f"{job['state']:<8} {uri}  attempts={job.get('attempts', 0)}  {job['ts']}"
+            if job.get("error"):
+                line += f"  error={job['error']}"
+            print(line)
+        counts = ctx.queue.status()
+        print(", ".join(f"{state}: {n}" for state, n in sorted(counts.items())) or "Queue is empty.")
     else:
         parser.print_help()
 
@@ -0,0 +1,96 @@
+import contextlib
+import hashlib
+import json as jsonlib
+import os
+
+import requests
+
+from ctxpack import CtxPack
+
+# In-memory stand-in for the OCI registry endpoints ctxpack talks to, so push/pull
+# behaviour can be tested offline. Blobs and manifests are kept per "registry/repo".
+
+class _Response:
+    def __init__(self, status_code=200, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.text = ""
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+class FakeRegistry:
+    def __init__(self):
+        self.blobs = {}
+        self.manifests = {}
+        self.uploads = []
+
+    @staticmethod
+    def _split(url):
+        # https://<registry>/v2/<repo>/<kind>/<ref>
+        registry, _, path = url.split("://", 1)[1].partition("/v2/")
+        repo, kind, ref = path.rsplit("/", 2)
+        return f"{registry}/{repo}", kind, ref.split("?")[0]
+
+    def get(self, url, headers=None, stream=False):
+        if "/token?" in url:
+            return _Response(200, b'{"token": "fake"}')
+        where, kind, ref = self._split(url)
+        store = self.manifests if kind == "manifests" else self.blobs
+        data = store.get((where, ref))
+        if data is None:
+            return _Response(404)
+        return _Response(200, data, {"Docker-Content-Digest": f"sha256:{hashlib.sha256(data).hexdigest()}"})
+
+    def head(self, url, headers=None):
+        where, kind, ref = self._split(url)
+        store = self.manifests if kind == "manifests" else self.blobs
+        return _Response(200 if (where, ref) in store else 404)
+
+    def post(self, url, headers=None):
+        where = url.split("://", 1)[1].split("/blobs/uploads/")[0].replace("/v2/", "/")
+        return _Response(202, headers={"Location": f"https://upload/{where}/session"})
+
+    def put(self, url, headers=None, data=None, json=None):
+        if "/manifests/" in url:
+            where, _, ref = self._split(url)
+            self.manifests[(where, ref)] = jsonlib.dumps(json).encode()
+            return _Response(201)
+        where = url.split("https://upload/", 1)[1].split("/session")[0]
+        data = data.read() if hasattr(data, "read") else data
+        digest = url.split("digest=")[1]
+        self.blobs[(where, digest)] = data
+        self.uploads.append((where, digest))
+        return _Response(201)
+
+    @contextlib.contextmanager
+    def install(self):
+        saved = {name: getattr(requests, name) for name in ("get", "head", "post", "put")}
+        for name in saved:
+            setattr(requests, name, getattr(self, name))
+        try:
+            yield self
+        finally:
+            for name, fn in saved.items():
+                setattr(requests, name, fn)
+
+def registry_ctx(tmp, name="cache"):
+    # A CtxPack whose default destination is the fake registry's "registry.test/org/packs".
+    ctx = CtxPack(cache_dir=os.path.join(tmp, name))
+    ctx.registry_url, ctx.repo = "registry.test", "org/packs"
+    return ctx
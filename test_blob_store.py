@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from ctxpack import BlobStore, CtxPackError
+from fake_registry import FakeRegistry, registry_ctx
+
+CONFIG_DIGEST = f"sha256:{hashlib.sha256(b'{}').hexdigest()}"
+
+def _seed(ctx, tmp, name, size=4096):
+    out = os.path.join(tmp, f"out_{name}")
+    os.makedirs(out)
+    with open(os.path.join(out, "index.vec"), "wb") as f:
+        f.write(os.urandom(size))
+    return ctx.seed(out, {"dataset": name})
+
+def test_repeated_and_multi_destination_pushes_reuse_one_blob():
+    with tempfile.TemporaryDirectory() as tmp, FakeRegistry().install() as registry:
+        ctx = registry_ctx(tmp)
+        uri = _seed(ctx, tmp, "a")
+        assert ctx.push(uri, to=["r1.test/org/packs", "r2.test/ml/packs"])
+        assert ctx.push(uri)
+        layers = [(where, digest) for where, digest in registry.uploads if digest != CONFIG_DIGEST]
+        assert len({digest for _, digest in layers}) == 1
+        assert [where for where, _ in layers] == ["r1.test/org/packs", "r2.test/ml/packs", "registry.test/org/packs"]
+        assert len(list(Path(ctx.blobs.root).glob("*.tar.gz"))) == 1
+        assert ctx.push(uri)  # registry already has the layer: no second upload
+        assert len([u for u in registry.uploads if u[1] != CONFIG_DIGEST]) == 3
+
+def test_reseeding_drops_stale_blobs():
+    with tempfile.TemporaryDirectory() as tmp, FakeRegistry().install() as registry:
+        ctx = registry_ctx(tmp)
+        uri = _seed(ctx, tmp, "a")
+        ctx.push(uri)
+        ctx.seed(os.path.join(tmp, "out_a"), {"dataset": "a"})
+        assert ctx.blobs._load() == {}
+
+def test_eviction_skips_blobs_pinned_by_a_push():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = registry_ctx(tmp)
+        ctx.blobs.budget = 1000
+        uri_a = _seed(ctx, tmp, "a")
+        uri_b = _seed(ctx, tmp, "b")
+        with ctx.blobs.lease(uri_a):
+            blob_a = ctx._build_blobs(uri_a)[0]
+            ctx._build_blobs(uri_b)
+            assert Path(blob_a["path"]).exists()
+        ctx._build_blobs(uri_b)  # A is unpinned now and over budget
+        assert not Path(blob_a["path"]).exists()
+        assert not list(ctx.blobs.lease_dir.iterdir())
+
+def test_stale_leases_from_dead_processes_are_ignored():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore(tmp, budget=0)
+        store.lease_dir.mkdir(parents=True)
+        (store.lease_dir / "abc.1.999999999").touch()
+        assert store._pinned() == set()
+        assert not list(store.lease_dir.iterdir())
+
+def test_failed_build_leaves_no_tmp_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore(tmp, budget=10 ** 9)
+
+        def broken(tar_path):
+            Path(tar_path).write_bytes(b"partial")
+            raise OSError("disk full")
+
+        with pytest.raises(OSError):
+            store.get_or_build("ctx://sha256:abc", "gzip", "sha256:0", broken)
+        assert sorted(p.name for p in Path(tmp).iterdir()) == [".lock"]
+
+def test_concurrent_build_of_the_same_key_keeps_one_blob():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore(tmp, budget=10 ** 9)
+        key = ("ctx://sha256:abc", "gzip", "sha256:0")
+
+        def build_other(tar_path):
+            Path(tar_path).write_bytes(b"other worker")
+
+        def build_mine(tar_path):
+            # Another worker finishes the same key while this build is in flight.
+            store.get_or_build(*key, build_other)
+            Path(tar_path).write_bytes(b"this worker")
+
+        entry = store.get_or_build(*key, build_mine)
+        assert Path(entry["path"]).read_bytes() == b"other worker"
+        assert len(list(Path(tmp).glob("*.tar.gz"))) == 1
+        assert list(store._load().values())[0]["path"] == entry["path"]
+
+def test_rebuilt_layers_are_byte_identical():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = registry_ctx(tmp)
+        uri = _seed(ctx, tmp, "a")
+        first = ctx._build_blobs(uri)[0]["digest"]
+        ctx.blobs.forget(uri)
+        real_time = time.time
+        time.time = lambda: real_time() + 3600  # gzip would otherwise stamp a new header time
+        try:
+            second = ctx._build_blobs(uri)[0]["digest"]
+        finally:
+            time.time = real_time
+        assert first == second
+
+def test_destinations_must_name_a_repo():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = registry_ctx(tmp)
+        uri = _seed(ctx, tmp, "a")
+        with pytest.raises(CtxPackError, match="REGISTRY/REPO"):
+            ctx.push(uri, to=["ghcr.io"])
+
+def test_seed_enqueue_keeps_destinations():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = registry_ctx(tmp)
+        out = os.path.join(tmp, "out")
+        os.makedirs(out)
+        uri = ctx.seed(out, {"dataset": "q"}, enqueue=True, to=["r1.test/org/packs"])
+        with open(ctx.queue.journal) as f:
+            assert json.loads(f.readline())["to"] == ["r1.test/org/packs"]
+        assert ctx.queue.jobs()[uri]["state"] == "pending"
+
+if __name__ == "__main__":
+    test_repeated_and_multi_destination_pushes_reuse_one_blob()
+    test_reseeding_drops_stale_blobs()
+    test_eviction_skips_blobs_pinned_by_a_push()
+    test_stale_leases_from_dead_processes_are_ignored()
+    test_failed_build_leaves_no_tmp_files()
+    test_concurrent_build_of_the_same_key_keeps_one_blob()
+    test_rebuilt_layers_are_byte_identical()
+    test_destinations_must_name_a_repo()
+    test_seed_enqueue_keeps_destinations()
+    print("✅ BlobStore checks passed")
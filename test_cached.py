@@ -0,0 +1,130 @@
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import ctxpack
+from ctxpack import CtxPack, CtxPackError
+
+def _local_ctx(tmp):
+    ctx = CtxPack(cache_dir=os.path.join(tmp, "cache"))
+    ctx.repo = None  # never consult a registry
+    return ctx
+
+def test_second_call_is_a_cache_hit():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = _local_ctx(tmp)
+        calls = []
+
+        @ctxpack.cached(params={"chunk_size": 512}, ctx=ctx)
+        def build(out_dir, src):
+            calls.append(src)
+            (out_dir / "index.vec").write_text(str(src))
+
+        first = build(Path(tmp) / "docs")
+        second = build(Path(tmp) / "docs")
+        assert first == second and calls == [Path(tmp) / "docs"]
+        assert (first / "index.vec").read_text() == str(Path(tmp) / "docs")
+        assert build("other") != first and len(calls) == 2
+
+def test_concurrent_callers_share_one_computation():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = _local_ctx(tmp)
+        calls = []
+
+        @ctxpack.cached(ctx=ctx)
+        def build(out_dir):
+            calls.append(1)
+            time.sleep(0.2)
+            (out_dir / "r").write_text("ok")
+
+        threads = [threading.Thread(target=build) for _ in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        assert len(calls) == 1
+        assert not ctxpack._inflight
+
+def test_unserializable_argument_is_rejected_by_name():
+    with tempfile.TemporaryDirectory() as tmp:
+        @ctxpack.cached(ctx=_local_ctx(tmp))
+        def build(out_dir, model):
+            pass
+
+        with pytest.raises(CtxPackError, match="args\\[0\\]"):
+            build(object())
+
+def test_temp_output_is_removed_when_seed_fails():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = _local_ctx(tmp)
+        out_dirs = []
+
+        def broken_seed(*args, **kwargs):
+            raise OSError("disk full")
+        ctx.seed = broken_seed
+
+        @ctxpack.cached(ctx=ctx)
+        def build(out_dir):
+            out_dirs.append(out_dir)
+
+        with pytest.raises(OSError):
+            build()
+        assert not out_dirs[0].exists()
+        assert not ctxpack._inflight
+
+def test_context_manager_seeds_on_clean_exit():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = _local_ctx(tmp)
+        with ctxpack.cached(name="ocr", ctx=ctx) as entry:
+            assert not entry.hit
+            (entry.out_dir / "page.txt").write_text("text")
+        with ctxpack.cached(name="ocr", ctx=ctx) as again:
+            assert again.hit and (again.path / "page.txt").read_text() == "text"
+
+def test_changing_an_input_file_is_a_miss():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = _local_ctx(tmp)
+        data = Path(tmp) / "data.csv"
+        data.write_text("a")
+
+        @ctxpack.cached(inputs=[data], ctx=ctx)
+        def build(out_dir):
+            (out_dir / "copy.csv").write_text(data.read_text())
+
+        assert (build() / "copy.csv").read_text() == "a"
+        data.write_text("b")
+        assert (build() / "copy.csv").read_text() == "b"
+
+def test_missing_input_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        @ctxpack.cached(inputs=[Path(tmp) / "missing.csv"], ctx=_local_ctx(tmp))
+        def build(out_dir):
+            pass
+
+        with pytest.raises(CtxPackError, match="does not exist"):
+            build()
+
+def test_functions_without_source_are_fingerprinted_by_code_object():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = _local_ctx(tmp)
+        outputs = []
+        for literal in ("a", "b", "a"):
+            scope = {}
+            exec(f"def build(out_dir, suffix='!'):\n    (out_dir / 'r').write_text('{literal}' + suffix)", scope)
+            path = ctxpack.cached(ctx=ctx)(scope["build"])()
+            outputs.append((path, (path / "r").read_text()))
+        assert outputs[0][1] == "a!" and outputs[1][1] == "b!"
+        assert outputs[0][0] != outputs[1][0] and outputs[0][0] == outputs[2][0]
+
+if __name__ == "__main__":
+    test_second_call_is_a_cache_hit()
+    test_concurrent_callers_share_one_computation()
+    test_unserializable_argument_is_rejected_by_name()
+    test_temp_output_is_removed_when_seed_fails()
+    test_context_manager_seeds_on_clean_exit()
+    test_changing_an_input_file_is_a_miss()
+    test_missing_input_is_rejected()
+    test_functions_without_source_are_fingerprinted_by_code_object()
+    print("✅ cached() checks passed")
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+import pytest
+
+from ctxpack import CtxPack, CtxPackError, SecurityError
+
+def _seeded(tmp):
+    out = os.path.join(tmp, "out")
+    os.makedirs(os.path.join(out, "sub"))
+    with open(os.path.join(out, "index.vec"), "wb") as f:
+        f.write(b"\x00" * 4096 + b"VEC")
+    with open(os.path.join(out, "sub", "chunks.jsonl"), "w") as f:
+        f.write('{"id": 0}\n')
+    open(os.path.join(out, "empty.bin"), "w").close()
+    ctx = CtxPack(cache_dir=os.path.join(tmp, "cache"))
+    return ctx, ctx.seed(out, {"dataset": "pack-handle-test"})
+
+def test_views_are_read_only_and_zero_copy():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx, uri = _seeded(tmp)
+        with ctx.open(uri) as pack:
+            assert pack.files() == ["empty.bin", "index.vec", "manifest.json", "sub/chunks.jsonl"]
+            view = pack.view("index.vec")
+            assert view.readonly and view[-3:].tobytes() == b"VEC"
+            assert pack.mmap("index.vec") is pack.mmap("index.vec")
+            assert pack.view("empty.bin").nbytes == 0
+            with pytest.raises(CtxPackError):
+                pack.mmap("empty.bin")
+            del view
+
+def test_resolve_rejects_paths_outside_the_pack():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx, uri = _seeded(tmp)
+        with ctx.open(uri) as pack:
+            for name in ("../outside", "sub/../../outside", "/etc/passwd"):
+                with pytest.raises(SecurityError):
+                    pack.view(name)
+            with pytest.raises(CtxPackError):
+                pack.view("missing.bin")
+
+if __name__ == "__main__":
+    test_views_are_read_only_and_zero_copy()
+    test_resolve_rejects_paths_outside_the_pack()
+    print("✅ PackHandle checks passed")
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from ctxpack import CtxPack, PushQueue
+
+def _queue(tmp, push, retries=3):
+    ctx = CtxPack(cache_dir=os.path.join(tmp, "cache"))
+    ctx.push = push
+    return ctx, PushQueue(ctx, workers=2, retries=retries, backoff=0.01)
+
+def _journal_lines(queue):
+    with open(queue.journal) as f:
+        return f.readlines()
+
+def test_retry_ends_in_done_and_exhaustion_in_failed():
+    with tempfile.TemporaryDirectory() as tmp:
+        attempts = {}
+
+        def flaky_push(uri, to=None):
+            attempts[uri] = attempts.get(uri, 0) + 1
+            if uri.endswith("bad"):
+                return False
+            if attempts[uri] == 1:
+                raise ConnectionError("reset by peer")
+            return True
+
+        ctx, queue = _queue(tmp, flaky_push)
+        queue.enqueue("ctx://sha256:good")
+        queue.enqueue("ctx://sha256:bad")
+        queue.drain()
+        jobs = queue.jobs()
+        assert jobs["ctx://sha256:good"]["state"] == "done" and attempts["ctx://sha256:good"] == 2
+        assert jobs["ctx://sha256:bad"]["state"] == "failed" and attempts["ctx://sha256:bad"] == 3
+        assert jobs["ctx://sha256:bad"]["error"] == "registry rejected manifest"
+        assert queue.status() == {"done": 1, "failed": 1}
+
+def test_jobs_survive_a_crashed_worker_and_destinations_are_kept():
+    with tempfile.TemporaryDirectory() as tmp:
+        pushed = []
+        ctx, queue = _queue(tmp, lambda uri, to=None: pushed.append((uri, to)) or True)
+        queue.enqueue("ctx://sha256:a", to=["r1.io/org/packs"])
+        queue._append("ctx://sha256:a", state="running", attempts=1)  # worker died mid-push
+        with open(queue.journal, "a") as f:
+            f.write('{"uri": "ctx://sha256:torn", "sta')  # torn final write
+        queue.enqueue("ctx://sha256:b")
+        queue.drain()
+        assert sorted(pushed) == [("ctx://sha256:a", ["r1.io/org/packs"]), ("ctx://sha256:b", None)]
+        assert queue.jobs()["ctx://sha256:a"]["attempts"] == 2
+
+def test_drain_compacts_the_journal():
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx, queue = _queue(tmp, lambda uri, to=None: True)
+        for i in range(20):
+            queue.enqueue(f"ctx://sha256:{i}")
+        queue.drain()
+        assert len(_journal_lines(queue)) > 20
+        queue.enqueue("ctx://sha256:next")
+        queue.drain()  # compacts away the 20 finished jobs before draining
+        assert list(queue.jobs()) == ["ctx://sha256:next"]
+        assert len(_journal_lines(queue)) == 3  # pending, running, done for the new job
+
+def test_cli_rejects_invalid_daemon_and_seed_options():
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ctxpack.py")
+    with tempfile.TemporaryDirectory() as tmp:
+        for args in (["push-daemon", "--workers", "0"], ["push-daemon", "--retries", "-1"],
+                     ["seed", tmp, "--contract", "c.json", "--to", "r1.io/org/packs"]):
+            r = subprocess.run([sys.executable, cli, *args], cwd=tmp, capture_output=True, text=True)
+            assert r.returncode == 2 and "error:" in r.stderr, args
+
+if __name__ == "__main__":
+    test_retry_ends_in_done_and_exhaustion_in_failed()
+    test_jobs_survive_a_crashed_worker_and_destinations_are_kept()
+    test_drain_compacts_the_journal()
+    test_cli_rejects_invalid_daemon_and_seed_options()
+    print("✅ PushQueue checks passed")
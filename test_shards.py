@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from ctxpack import CtxPack, CtxPackError
+from fake_registry import FakeRegistry, registry_ctx
+
+def _files(root):
+    return {os.path.relpath(os.path.join(d, f), root): open(os.path.join(d, f), "rb").read()
+            for d, _, names in os.walk(root) for f in names}
+
+def _seed_sharded(tmp, shards=3):
+    out = os.path.join(tmp, "out")
+    os.makedirs(os.path.join(out, "vectors"))
+    for i in range(7):
+        with open(os.path.join(out, "vectors", f"part{i}.vec"), "wb") as f:
+            f.write(os.urandom(1000 * (i + 1)))
+    with open(os.path.join(out, "chunks.jsonl"), "w") as f:
+        f.write('{"id": 0}\n')
+    producer = registry_ctx(tmp, "producer")
+    uri = producer.seed(out, {"dataset": "sharded"}, shards=shards)
+    return producer, uri
+
+def test_seed_balances_files_across_shards():
+    with tempfile.TemporaryDirectory() as tmp:
+        producer, uri = _seed_sharded(tmp)
+        with open(producer.cache_dir / uri.split(":")[-1] / "manifest.json") as f:
+            plan = json.load(f)["shards"]
+        assert len(plan) == 3
+        names = [name for shard in plan for name in shard["files"]]
+        assert sorted(names) == sorted(set(names)) and len(names) == 8
+        sizes = [shard["size"] for shard in plan]
+        assert max(sizes) - min(sizes) <= 7000
+
+def test_sharded_round_trip_and_partial_pull():
+    with tempfile.TemporaryDirectory() as tmp, FakeRegistry().install() as registry:
+        producer, uri = _seed_sharded(tmp)
+        assert producer.push(uri)
+        layers = json.loads(registry.manifests[("registry.test/org/packs", uri.split(":")[-1][:12])])["layers"]
+        assert [layer["annotations"]["org.ctxpack.shard"] for layer in layers] == ["0", "1", "2"]
+
+        consumer = registry_ctx(tmp, "consumer")
+        path = consumer.pull(uri, shards=[1])
+        assert consumer._local_path(uri) is None  # still partial
+        assert consumer.pull(uri, shards=[1]) == path  # already present, no refetch
+        with pytest.raises(CtxPackError, match="no shard"):
+            consumer.pull(uri, shards=[9])
+
+        assert consumer.pull(uri) == path
+        assert consumer._local_path(uri) == path
+        assert _files(path) == _files(producer.cache_dir / uri.split(":")[-1])
+
+def test_stale_partial_marker_without_pack_dir_is_discarded():
+    with tempfile.TemporaryDirectory() as tmp, FakeRegistry().install():
+        producer, uri = _seed_sharded(tmp)
+        producer.push(uri)
+        consumer = registry_ctx(tmp, "consumer")
+        path = consumer.pull(uri, shards=[0, 1])
+        shutil.rmtree(path)  # e.g. manual cleanup that left the marker behind
+        assert consumer.pull(uri) == path
+        assert consumer._local_path(uri) == path
+        assert _files(path) == _files(producer.cache_dir / uri.split(":")[-1])
+
+def test_unsharded_pack_is_a_single_layer():
+    with tempfile.TemporaryDirectory() as tmp, FakeRegistry().install() as registry:
+        producer, uri = _seed_sharded(tmp, shards=1)
+        producer.push(uri)
+        layers = json.loads(registry.manifests[("registry.test/org/packs", uri.split(":")[-1][:12])])["layers"]
+        assert len(layers) == 1 and "annotations" not in layers[0]
+        consumer = registry_ctx(tmp, "consumer")
+        assert _files(consumer.pull(uri)) == _files(producer.cache_dir / uri.split(":")[-1])
+
+def test_marker_listing_every_shard_does_not_wedge_the_pack():
+    with tempfile.TemporaryDirectory() as tmp, FakeRegistry().install():
+        producer, uri = _seed_sharded(tmp)
+        producer.push(uri)
+        consumer = registry_ctx(tmp, "consumer")
+        path = consumer.pull(uri)
+        marker = consumer.cache_dir / f"{uri.split(':')[-1]}.partial"
+        marker.write_text("[0, 1, 2]")  # crash between the final merge and clearing the marker
+        assert consumer.pull(uri) == path
+        assert not marker.exists() and consumer._local_path(uri) == path
+        with pytest.raises(CtxPackError, match="requests nothing"):
+            consumer.pull(uri, shards=[])
+
+def test_worker_count_and_shard_size_are_at_least_one():
+    os.environ["CTXP_WORKERS"] = "0"
+    os.environ["CTXP_SHARD_SIZE"] = "0"
+    try:
+        ctx = CtxPack()
+        assert ctx.workers == 1 and ctx.shard_size == 1
+        with tempfile.TemporaryDirectory() as tmp:
+            producer, uri = _seed_sharded(tmp, shards=None)
+            with open(producer.cache_dir / uri.split(":")[-1] / "manifest.json") as f:
+                assert len(json.load(f)["shards"]) == 8  # one file per shard
+    finally:
+        del os.environ["CTXP_WORKERS"]
+        del os.environ["CTXP_SHARD_SIZE"]
+
+if __name__ == "__main__":
+    test_seed_balances_files_across_shards()
+    test_sharded_round_trip_and_partial_pull()
+    test_stale_partial_marker_without_pack_dir_is_discarded()
+    test_unsharded_pack_is_a_single_layer()
+    test_marker_listing_every_shard_does_not_wedge_the_pack()
+    test_worker_count_and_shard_size_are_at_least_one()
+    print("✅ Shard checks passed")
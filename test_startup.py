@@ -0,0 +1,55 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Local-only commands must not load the network or tar stack, and cold CLI latency
+# must stay close to a bare interpreter. Override the budget with CTXP_STARTUP_BUDGET_MS.
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLI = os.path.join(HERE, "ctxpack.py")
+BUDGET_MS = float(os.getenv("CTXP_STARTUP_BUDGET_MS", "100"))
+RUNS = 15
+HEAVY = ["requests", "urllib3", "idna", "charset_normalizer", "tarfile", "concurrent.futures", "inspect"]
+URI = "ctx://sha256:" + "0" * 64
+
+def _median_ms(args, cwd):
+    times = []
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=cwd, capture_output=True)
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+def test_import_is_lightweight():
+    # Compare against a bare interpreter so modules pulled in by site hooks don't count.
+    probe = (
+        "import sys; before = set(sys.modules); sys.path.insert(0, %r); import ctxpack; "
+        "print(','.join(m for m in %r if m in sys.modules and m not in before))"
+    ) % (HERE, HEAVY)
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    loaded = [m for m in out.stdout.strip().split(",") if m]
+    assert not loaded, f"ctxpack import pulled in {loaded}"
+
+def test_local_commands_skip_network_and_disk():
+    with tempfile.TemporaryDirectory() as cwd:
+        r = subprocess.run([sys.executable, CLI, "exists", URI, "--local"], cwd=cwd, capture_output=True, text=True)
+        assert r.returncode == 1 and r.stdout.strip() == "no"
+        r = subprocess.run([sys.executable, CLI, "inspect", URI], cwd=cwd, capture_output=True, text=True)
+        assert "not in local cache" in r.stdout
+        assert not os.path.exists(os.path.join(cwd, ".ctx_cache")), "CLI created a cache dir for a read-only command"
+
+def test_cold_cli_latency():
+    with tempfile.TemporaryDirectory() as cwd:
+        bare = _median_ms(["-c", "pass"], cwd)
+        cli = _median_ms([CLI, "exists", URI, "--local"], cwd)
+    overhead = cli - bare
+    print(f"bare interpreter: {bare:.1f}ms  ctxpack exists --local: {cli:.1f}ms  overhead: {overhead:.1f}ms")
+    assert overhead < BUDGET_MS, f"CLI startup overhead {overhead:.1f}ms exceeds {BUDGET_MS:.0f}ms budget"
+
+if __name__ == "__main__":
+    test_import_is_lightweight()
+    test_local_commands_skip_network_and_disk()
+    test_cold_cli_latency()
+    print("✅ Startup checks passed")